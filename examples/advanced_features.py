@@ -6,8 +6,68 @@ Demonstrates error handling, reconnection, multiple connections, and authenticat
 import streamlit as st
 import streamlit_websocket_client as swc
 import json
-from datetime import datetime
 import time
+import numpy as np
+
+# Optional MessagePack binary framing for perf test payloads (enabled in Tab 4)
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Test scenario URLs for the Error Handling tab
+URL_MAP = {
+    "Valid Echo Server": "wss://ws.postman-echo.com/raw",
+    "Invalid URL": "wss://this-server-does-not-exist-12345.com/ws",
+    "Non-existent Server": "ws://localhost:9999",
+    "Malformed URL": "not-a-websocket-url"
+}
+
+# Status indicator indexed by WebSocket ready_state:
+# CONNECTING=0, OPEN=1, CLOSING=2, CLOSED=3
+STATUS_EMOJI = ("🟡", "🟢", "🟡", "🔴")
+
+
+def pack_batch(seqs, packed_data, ts):
+    """MessagePack-encode {"type": "batch", "batch": [{"seq", "data", "ts"}, ...]}.
+    
+    `packed_data` is the pre-packed "data" key and value, spliced into each
+    message instead of building and packing a dict per message.
+    """
+    packer = msgpack.Packer(use_bin_type=True)
+    head = packer.pack_map_header(3) + packer.pack("seq")
+    tail = packed_data + packer.pack("ts") + packer.pack(ts)
+    parts = [
+        packer.pack_map_header(2),
+        packer.pack("type"), packer.pack("batch"),
+        packer.pack("batch"), packer.pack_array_header(len(seqs)),
+    ]
+    parts.extend(head + packer.pack(j) + tail for j in seqs)
+    return b"".join(parts)
+
+
+# Deliberately not st.cache_data: that cache is shared by every session and
+# would keep the raw tokens and API keys typed into the auth tab around
+def parse_headers(raw: str) -> dict:
+    """Parse `Key: Value` lines into a headers dict."""
+    headers = {}
+    for line in raw.strip().split('\n'):
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip()] = value.strip()
+    return headers
+
+
+def mask_headers(headers: dict) -> dict:
+    """Mask secret header values for display."""
+    masked_headers = {}
+    for k, v in headers.items():
+        if k.lower() in ['authorization', 'x-api-key', 'api-key']:
+            masked_headers[k] = v[:10] + "..." if len(v) > 10 else "***"
+        else:
+            masked_headers[k] = v
+    return masked_headers
+
 
 st.set_page_config(
     page_title="Advanced WebSocket Features",
@@ -17,16 +77,18 @@ st.set_page_config(
 
 st.title("⚡ Advanced WebSocket Features")
 
-# Tabs for different examples
-tab1, tab2, tab3, tab4 = st.tabs([
+# Tab selector for different examples. Unlike st.tabs, only the selected
+# tab's code runs on each rerun.
+TABS = [
     "Error Handling", 
     "Multiple Connections", 
     "Authentication", 
     "Performance Testing"
-])
+]
+active_tab = st.radio("Example", TABS, horizontal=True, label_visibility="collapsed")
 
 # Tab 1: Error Handling
-with tab1:
+if active_tab == TABS[0]:
     st.header("Error Handling & Reconnection")
     
     col1, col2 = st.columns(2)
@@ -37,27 +99,23 @@ with tab1:
         # URLs for testing different scenarios
         test_scenario = st.selectbox(
             "Test Scenario",
-            [
-                "Valid Echo Server",
-                "Invalid URL",
-                "Non-existent Server",
-                "Malformed URL"
-            ]
+            list(URL_MAP)
         )
         
-        url_map = {
-            "Valid Echo Server": "wss://ws.postman-echo.com/raw",
-            "Invalid URL": "wss://this-server-does-not-exist-12345.com/ws",
-            "Non-existent Server": "ws://localhost:9999",
-            "Malformed URL": "not-a-websocket-url"
-        }
+        test_url = URL_MAP[test_scenario]
         
-        test_url = url_map[test_scenario]
+        # Reconnection settings (in a form so tweaking them doesn't rerun the app
+        # until the changes are applied)
+        with st.form("reconnect_settings"):
+            auto_reconnect = st.checkbox("Enable Auto-Reconnect", value=True)
+            max_attempts = st.slider("Max Reconnect Attempts", 1, 10, 5)
+            reconnect_interval = st.slider("Base Reconnect Interval (seconds)", 1, 10, 3)
+            st.form_submit_button("Apply Settings")
         
-        # Reconnection settings
-        auto_reconnect = st.checkbox("Enable Auto-Reconnect", value=True)
-        max_attempts = st.slider("Max Reconnect Attempts", 1, 10, 5)
-        reconnect_interval = st.slider("Reconnect Interval (seconds)", 1, 10, 3)
+        # The client doubles the delay on each attempt (capped at 30s) and applies
+        # up to 30% jitter so many clients don't reconnect in lockstep
+        backoff = [min(reconnect_interval * 2 ** a, 30) for a in range(max_attempts)]
+        st.caption("Backoff schedule: " + ", ".join(f"~{d:g}s" for d in backoff))
     
     with col2:
         st.subheader("Connection Test")
@@ -73,14 +131,8 @@ with tab1:
             )
             
             # Display status
-            status_color = {
-                "CONNECTING": "🟡",
-                "OPEN": "🟢",
-                "CLOSED": "🔴",
-                "ERROR": "🔴"
-            }
-            
-            st.markdown(f"### {status_color.get(conn.state, '⚪')} Status: {conn.state}")
+            status_emoji = STATUS_EMOJI[conn.ready_state] if conn.ready_state is not None else '⚪'
+            st.markdown(f"### {status_emoji} Status: {conn.state}")
             
             if conn.error:
                 st.error(f"Error Details: {conn.error}")
@@ -97,10 +149,15 @@ with tab1:
             
             # Test sending message
             if conn.is_open():
-                if st.button("Send Test Message"):
-                    conn.send({"type": "test", "timestamp": datetime.now().isoformat()})
+                if st.session_state.pop("error_test_sent", False):
                     st.success("Message sent!")
                 
+                if st.button("Send Test Message"):
+                    conn.send({"type": "test", "ts": time.time_ns()})
+                    # Rerun so connect() hands the queued message to the browser
+                    st.session_state.error_test_sent = True
+                    st.rerun()
+                
                 if conn.last_message:
                     st.info(f"Received: {conn.last_message}")
             
@@ -109,7 +166,7 @@ with tab1:
             st.exception(e)
 
 # Tab 2: Multiple Connections
-with tab2:
+if active_tab == TABS[1]:
     st.header("Multiple Simultaneous Connections")
     
     st.info("This example shows how to manage multiple WebSocket connections simultaneously.")
@@ -124,14 +181,19 @@ with tab2:
         with cols[i]:
             st.subheader(f"Connection {i+1}")
             
-            # Each connection can have different settings
-            url = st.text_input(
-                f"URL {i+1}",
-                value="wss://ws.postman-echo.com/raw",
-                key=f"url_{i}"
-            )
+            # Each connection can have different settings; the form batches
+            # keystrokes into a single rerun on submit
+            with st.form(f"conn_form_{i}"):
+                url = st.text_input(
+                    f"URL {i+1}",
+                    value="wss://ws.postman-echo.com/raw",
+                    key=f"url_{i}"
+                )
+                msg = st.text_input(f"Message {i+1}", key=f"msg_{i}")
+                send_clicked = st.form_submit_button("Send")
             
-            # Create connection
+            # Create connection; the stable per-panel key keeps its socket open
+            # across reruns
             conn = swc.connect(
                 url=url,
                 key=f"multi_conn_{i}",
@@ -147,11 +209,15 @@ with tab2:
                 st.error(f"🔴 {conn.state}")
             
             # Send message
-            msg = st.text_input(f"Message {i+1}", key=f"msg_{i}")
-            if st.button(f"Send", key=f"send_{i}"):
+            if st.session_state.pop(f"multi_sent_{i}", False):
+                st.success("Sent!")
+            
+            if send_clicked:
                 if conn.is_open():
                     conn.send(msg)
-                    st.success("Sent!")
+                    # Rerun so connect() hands the queued message to the browser
+                    st.session_state[f"multi_sent_{i}"] = True
+                    st.rerun()
                 else:
                     st.error("Not connected")
             
@@ -160,7 +226,7 @@ with tab2:
                 st.code(conn.last_message)
 
 # Tab 3: Authentication
-with tab3:
+if active_tab == TABS[2]:
     st.header("Authentication Examples")
     
     auth_method = st.radio(
@@ -185,21 +251,12 @@ with tab3:
         st.markdown("Add custom headers (one per line, format: `Key: Value`)")
         custom_headers = st.text_area("Headers", height=100)
         if custom_headers:
-            for line in custom_headers.strip().split('\n'):
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    headers[key.strip()] = value.strip()
+            headers.update(parse_headers(custom_headers))
     
     # Display headers (masked)
     if headers:
         st.markdown("### Headers to be sent:")
-        masked_headers = {}
-        for k, v in headers.items():
-            if k.lower() in ['authorization', 'x-api-key', 'api-key']:
-                masked_headers[k] = v[:10] + "..." if len(v) > 10 else "***"
-            else:
-                masked_headers[k] = v
-        st.json(masked_headers)
+        st.json(mask_headers(headers))
     
     # Test connection with auth
     ws_url = st.text_input(
@@ -224,7 +281,7 @@ with tab3:
             st.warning(f"⏳ Connection state: {conn.state}")
 
 # Tab 4: Performance Testing
-with tab4:
+if active_tab == TABS[3]:
     st.header("Performance & Stress Testing")
     
     col1, col2 = st.columns(2)
@@ -247,6 +304,20 @@ with tab4:
             "Test Duration (seconds)",
             1, 60, 10
         )
+        
+        # Messages coalesced into a single WebSocket frame
+        batch_size = st.slider(
+            "Batch Size (messages per frame)",
+            1, 500, 100
+        )
+        
+        # An explicit setting so results are comparable across environments
+        use_msgpack = st.checkbox(
+            "MessagePack framing (binary frames)",
+            value=False,
+            disabled=msgpack is None,
+            help=None if msgpack is not None else "Install msgpack to enable binary framing"
+        )
     
     with col2:
         st.subheader("Performance Metrics")
@@ -269,64 +340,141 @@ with tab4:
         with metric3:
             st.metric("Errors", metrics["errors"])
     
+    # Rendered on every run of this tab: each run's connect() call hands the
+    # batch queued by the previous run to the browser
+    conn = swc.connect(
+        url="wss://ws.postman-echo.com/raw",
+        key="perf_test"
+    )
+    
     # Performance test
-    if st.button("Start Performance Test", type="primary"):
-        conn = swc.connect(
-            url="wss://ws.postman-echo.com/raw",
-            key="perf_test"
-        )
-        
+    run = st.session_state.get("perf_run")
+    if st.button("Start Performance Test", type="primary", disabled=run is not None):
         if conn.is_open():
             st.session_state.perf_metrics["start_time"] = time.time()
             st.session_state.perf_metrics["sent"] = 0
             st.session_state.perf_metrics["received"] = 0
             st.session_state.perf_metrics["errors"] = 0
-            
-            progress_bar = st.progress(0)
-            status_text = st.empty()
+            st.session_state.pop("perf_summary", None)
             
             # Generate test message
             test_data = "x" * message_size
-            
-            start_time = time.time()
             messages_to_send = int(message_rate * test_duration)
             
-            for i in range(messages_to_send):
-                try:
-                    # Send message
-                    conn.send({
-                        "seq": i,
-                        "data": test_data,
-                        "timestamp": datetime.now().isoformat()
-                    })
-                    st.session_state.perf_metrics["sent"] += 1
-                    
-                    # Update progress
-                    progress = (i + 1) / messages_to_send
-                    progress_bar.progress(progress)
-                    status_text.text(f"Sending message {i+1}/{messages_to_send}")
-                    
-                    # Rate limiting
-                    time.sleep(1.0 / message_rate)
-                    
-                except Exception as e:
-                    st.session_state.perf_metrics["errors"] += 1
-                    st.error(f"Error: {e}")
-            
-            # Calculate results
-            elapsed = time.time() - start_time
-            st.success(f"Test completed in {elapsed:.2f} seconds")
-            
-            # Performance summary
-            st.markdown("### Performance Summary")
-            st.json({
-                "Total Messages": st.session_state.perf_metrics["sent"],
-                "Success Rate": f"{(1 - metrics['errors']/max(metrics['sent'], 1)) * 100:.1f}%",
-                "Average Rate": f"{metrics['sent']/elapsed:.1f} msg/sec",
-                "Total Data Sent": f"{metrics['sent'] * message_size / 1024 / 1024:.2f} MB"
-            })
+            # Per-batch stats, reduced once the test finishes
+            n_batches = -(-messages_to_send // batch_size)
+            run = st.session_state.perf_run = {
+                "batch": 0,
+                "n_batches": n_batches,
+                "messages_to_send": messages_to_send,
+                "batch_size": batch_size,
+                "message_rate": message_rate,
+                "message_size": message_size,
+                # Pre-serialize the message envelope once; only seq/ts vary per message.
+                # conn.send() passes strings through untouched, so no JSON work per send.
+                "payload_template": (
+                    '{"seq":%d,"data":' + json.dumps(test_data).replace("%", "%%") + ',"ts":%d}'
+                ),
+                "use_msgpack": use_msgpack,
+                # The data field is packed once too and spliced into every message
+                "packed_data": (
+                    msgpack.packb("data") + msgpack.packb(test_data, use_bin_type=True)
+                    if use_msgpack else None
+                ),
+                "start_time": time.time(),
+                # Pace against absolute deadlines so sleep jitter and reruns don't accumulate
+                "pace_start": time.monotonic(),
+                "batch_sent": np.zeros(n_batches, dtype=np.int64),
+                "queue_time": np.empty(n_batches, dtype=np.float64),
+                "batch_errors": np.zeros(n_batches, dtype=np.int64),  # Failed messages
+            }
         else:
             st.error("Failed to connect for performance test")
+    
+    if run is not None:
+        # One batch is queued per run, then the script reruns so connect()
+        # delivers it; the test therefore streams at the requested rate
+        b = run["batch"]
+        messages_to_send = run["messages_to_send"]
+        done = min(b * run["batch_size"], messages_to_send)
+        
+        # Browsers offer permessage-deflate on every handshake; the repetitive
+        # test data compresses extremely well if the server accepts it
+        if run["message_size"] >= 1024:
+            if "permessage-deflate" in conn.extensions:
+                st.info("🗜️ permessage-deflate negotiated: large payloads are compressed on the wire")
+            else:
+                st.warning("Server did not accept permessage-deflate: payloads are sent uncompressed")
+        
+        st.progress(done / messages_to_send)
+        st.text(f"Sent {done}/{messages_to_send} messages")
+        
+        if b < run["n_batches"]:
+            # Never overshoot the requested message count on the last batch
+            i = b * run["batch_size"]
+            batch_end = min(i + run["batch_size"], messages_to_send)
+            try:
+                if not conn.is_open():
+                    raise ConnectionError(f"connection is {conn.state}")
+                
+                # Send one framed message per batch window
+                t0 = time.monotonic()
+                ns = time.time_ns()
+                if run["use_msgpack"]:
+                    batch = range(i, batch_end)
+                    conn.send(pack_batch(batch, run["packed_data"], ns))
+                else:
+                    batch = [run["payload_template"] % (j, ns) for j in range(i, batch_end)]
+                    conn.send('{"type":"batch","batch":[' + ",".join(batch) + "]}")
+                run["queue_time"][b] = time.monotonic() - t0
+                run["batch_sent"][b] = len(batch)
+            except Exception as e:
+                run["batch_errors"][b] = batch_end - i
+                st.error(f"Error: {e}")
+            
+            run["batch"] += 1
+            st.session_state.perf_metrics["sent"] = int(run["batch_sent"].sum())
+            st.session_state.perf_metrics["errors"] = int(run["batch_errors"].sum())
+            
+            # Rate limiting
+            spin_threshold = 0.002  # Busy-wait the final 2 ms for sub-millisecond accuracy
+            next_deadline = run["pace_start"] + batch_end / run["message_rate"]
+            remaining = next_deadline - time.monotonic()
+            if remaining > spin_threshold:
+                time.sleep(remaining - spin_threshold)
+            while time.monotonic() < next_deadline:
+                pass
+            
+            st.rerun()
+        
+        # Calculate results; this run's connect() delivered the final batch
+        elapsed = time.time() - run["start_time"]
+        sent = st.session_state.perf_metrics["sent"]
+        errors = st.session_state.perf_metrics["errors"]
+        
+        # Performance summary
+        summary = {
+            "Framing": "MessagePack (binary)" if run["use_msgpack"] else "JSON (text)",
+            "Total Messages": sent,
+            "Success Rate": f"{(1 - errors/max(messages_to_send, 1)) * 100:.1f}%",
+            "Average Rate": f"{sent/elapsed:.1f} msg/sec",
+            "Total Data Sent": f"{sent * run['message_size'] / 1024 / 1024:.2f} MB"
+        }
+        # conn.send() only encodes and queues the frame; this is not network latency
+        ok_queue_time = run["queue_time"][run["batch_errors"] == 0]
+        if ok_queue_time.size:
+            p50, p99 = np.percentile(ok_queue_time, [50, 99]) * 1000
+            summary["Encode + Queue Time (p50 / p99)"] = f"{p50:.3f} / {p99:.3f} ms per batch"
+        
+        st.session_state.perf_summary = (elapsed, summary)
+        del st.session_state.perf_run
+        st.rerun()
+    
+    if "perf_summary" in st.session_state:
+        elapsed, summary = st.session_state.perf_summary
+        st.success(f"Test completed in {elapsed:.2f} seconds")
+        st.markdown("### Performance Summary")
+        st.json(summary)
 
 # Footer
 st.markdown("---")
@@ -6,7 +6,25 @@ Demonstrates connecting to a WebSocket server and displaying real-time data
 import streamlit as st
 import streamlit_websocket_client as swc
 import json
+from collections import deque
 from datetime import datetime
+import time
+
+# Use orjson for faster JSON input parsing when it is installed
+try:
+    import orjson
+    
+    json_loads = orjson.loads
+    
+    def json_dumps(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    json_loads = json.loads
+    json_dumps = json.dumps
+
+# Status indicator indexed by WebSocket ready_state:
+# CONNECTING=0, OPEN=1, CLOSING=2, CLOSED=3
+STATUS_EMOJI = ("🟡", "🟢", "🟡", "🔴")
 
 st.set_page_config(
     page_title="WebSocket Real-time Dashboard",
@@ -62,13 +80,6 @@ with col1:
     )
     
     # Display connection status
-    status_color = {
-        "CONNECTING": "🟡",
-        "OPEN": "🟢",
-        "CLOSED": "🔴",
-        "ERROR": "🔴"
-    }
-    
     st.metric(
         "Connection Status",
         conn.state,
@@ -77,7 +88,8 @@ with col1:
     )
     
     # Show status indicator
-    st.markdown(f"{status_color.get(conn.state, '⚪')} **{conn.state}**")
+    status_emoji = STATUS_EMOJI[conn.ready_state] if conn.ready_state is not None else '⚪'
+    st.markdown(f"{status_emoji} **{conn.state}**")
     
     if conn.error:
         st.error(f"Connection error: {conn.error}")
@@ -86,31 +98,37 @@ with col1:
     if conn.last_message:
         st.info("Latest Message Received:")
         
-        # Try to parse as JSON for pretty display
-        try:
-            if isinstance(conn.last_message, str):
-                message_data = json.loads(conn.last_message)
-                st.json(message_data)
-            else:
-                st.json(conn.last_message)
-        except:
+        # Text frames holding valid JSON already arrive parsed, so any string
+        # (or bytes from a binary frame) is shown raw
+        if isinstance(conn.last_message, str):
             st.code(conn.last_message)
+        elif isinstance(conn.last_message, bytes):
+            st.code(repr(conn.last_message))
+        else:
+            st.json(conn.last_message)
         
-        # Store messages in session state for history
-        if "message_history" not in st.session_state:
-            st.session_state.message_history = []
+        # Store rendered history rows (bounded to the last 10), formatting each
+        # message once when it first arrives rather than on every rerun
+        if "history_rows" not in st.session_state:
+            st.session_state.history_rows = deque(maxlen=10)
         
-        st.session_state.message_history.append({
-            "timestamp": datetime.now().strftime("%H:%M:%S"),
-            "message": conn.last_message
-        })
-        
-        # Keep only last 10 messages
-        st.session_state.message_history = st.session_state.message_history[-10:]
+        # Keyed on the arrival counter so an identical echo still gets its own row
+        if conn.message_count != st.session_state.get("last_seen_count"):
+            st.session_state.last_seen_count = conn.message_count
+            message_text = str(conn.last_message)
+            st.session_state.history_rows.append({
+                "Time": datetime.now().strftime("%H:%M:%S"),
+                "Message": message_text[:100] + "..." if len(message_text) > 100 else message_text
+            })
 
 with col2:
     st.subheader("Send Message")
     
+    # Confirmation from the previous run's send (see st.rerun() below)
+    send_notice = st.session_state.pop("send_notice", None)
+    if send_notice:
+        st.success(send_notice)
+    
     # Message input
     message_type = st.radio("Message Type", ["Text", "JSON"])
     
@@ -119,30 +137,27 @@ with col2:
         if st.button("Send Text", disabled=not conn.is_open()):
             if message:
                 conn.send(message)
-                st.success("Message sent!")
+                # Rerun so connect() hands the queued message to the browser
+                st.session_state.send_notice = "Message sent!"
+                st.rerun()
     else:
         # JSON input with example
-        default_json = '{"type": "ping", "timestamp": "' + datetime.now().isoformat() + '"}'
+        default_json = json_dumps({"type": "ping", "ts": time.time_ns()})
         message = st.text_area("JSON Message", value=default_json, height=100)
         if st.button("Send JSON", disabled=not conn.is_open()):
             try:
-                json_msg = json.loads(message)
-                conn.send(json_msg)
-                st.success("JSON message sent!")
-            except json.JSONDecodeError:
+                json_msg = json_loads(message)
+            except ValueError:  # json and orjson decode errors both subclass ValueError
                 st.error("Invalid JSON format")
+            else:
+                conn.send(json_msg)
+                st.session_state.send_notice = "JSON message sent!"
+                st.rerun()
 
 # Message History
 st.subheader("Message History")
-if "message_history" in st.session_state and st.session_state.message_history:
-    history_df = []
-    for item in st.session_state.message_history:
-        history_df.append({
-            "Time": item["timestamp"],
-            "Message": str(item["message"])[:100] + "..." if len(str(item["message"])) > 100 else str(item["message"])
-        })
-    
-    st.table(history_df)
+if st.session_state.get("history_rows"):
+    st.table(list(st.session_state.history_rows))
 else:
     st.info("No messages received yet. Send a message to see it echoed back!")
 
@@ -5,10 +5,49 @@ Demonstrates a real-time chat interface using streamlit-websocket-client
 
 import streamlit as st
 import streamlit_websocket_client as swc
+import html
 import json
+from collections import deque
 from datetime import datetime
+import time
 import uuid
 
+# Use orjson for faster parsing of JSON binary frames when it is installed
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+# Optional MessagePack binary framing for chat messages (enabled in the sidebar)
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Maximum number of chat messages kept in history
+MAX_MESSAGES = 500
+
+# Chat bubble styles, emitted once with the message history
+CHAT_CSS = """
+<style>
+.chat-row { display: flex; margin: 5px 0; }
+.chat-row.me { justify-content: flex-end; }
+.chat-bubble { padding: 10px; border-radius: 10px; max-width: 75%; }
+.chat-bubble small { opacity: 0.7; }
+.chat-row.me .chat-bubble { text-align: right; background-color: #007bff; color: white; }
+.chat-row.other .chat-bubble { background-color: #f1f1f1; color: black; }
+.chat-row.system .chat-bubble { flex: 1; max-width: 100%; background-color: #e8f4fd; color: #0c5460; }
+</style>
+"""
+
+
+def encode_message(obj, use_msgpack):
+    """Encode an outgoing message as MessagePack bytes if enabled (JSON otherwise)."""
+    if use_msgpack:
+        return msgpack.packb(obj, use_bin_type=True)
+    return obj
+
+
 st.set_page_config(
     page_title="WebSocket Chat",
     page_icon="💬",
@@ -19,20 +58,93 @@ st.set_page_config(
 if "user_id" not in st.session_state:
     st.session_state.user_id = str(uuid.uuid4())[:8]
 if "messages" not in st.session_state:
-    st.session_state.messages = []
+    st.session_state.messages = deque(maxlen=MAX_MESSAGES)
+if "msg_ids" not in st.session_state:
+    st.session_state.msg_ids = set()
 if "username" not in st.session_state:
     st.session_state.username = f"User_{st.session_state.user_id}"
 
+
+def system_message(text):
+    """Wrap a plain-text frame as a chat message from "System"."""
+    return {
+        "type": "message",
+        "user": "System",
+        "content": text,
+        "ts": time.time_ns()
+    }
+
+
+def format_time(msg):
+    """Render a message's send time; "ts" is an integer time.time_ns() stamp."""
+    ts = msg.get("ts")
+    if isinstance(ts, (int, float)):
+        return datetime.fromtimestamp(ts / 1e9).strftime("%H:%M:%S")
+    # Older clients send an ISO "timestamp" string
+    return str(msg.get("timestamp", ""))[:19]
+
+
+def message_id(msg):
+    """Hashable identity of a chat message, used for O(1) de-duplication."""
+    if isinstance(msg, dict):
+        try:
+            return hash((msg.get("user_id"), msg.get("ts", msg.get("timestamp")), msg.get("content")))
+        except TypeError:
+            # Unhashable field values (e.g. nested JSON objects)
+            pass
+    return hash(str(msg))
+
+
+def add_message(msg):
+    """Append a message to the history unless it has already been seen."""
+    mid = message_id(msg)
+    if mid in st.session_state.msg_ids:
+        return
+    
+    messages = st.session_state.messages
+    if len(messages) == messages.maxlen:
+        # The oldest message is about to be evicted; forget its id too
+        st.session_state.msg_ids.discard(message_id(messages[0]))
+    
+    messages.append(msg)
+    st.session_state.msg_ids.add(mid)
+
+
+def send_chat(conn, text, use_msgpack):
+    """Button callback: send `text` (or the typed message) and add it to the history."""
+    text = text or st.session_state.message_input
+    if not text:
+        return
+    if not conn.is_open():
+        st.session_state.send_failed = True
+        return
+    
+    # Create structured message
+    chat_message = {
+        "type": "message",
+        "user": st.session_state.username,
+        "content": text,
+        "ts": time.time_ns(),
+        "user_id": st.session_state.user_id
+    }
+    
+    # Send message
+    conn.send(encode_message(chat_message, use_msgpack))
+    
+    # Add to local message history (for echo servers) and reset the input
+    add_message(chat_message)
+    st.session_state.message_input = ""
+
+
 st.title("💬 WebSocket Chat Room")
 
 # Sidebar for settings
 with st.sidebar:
     st.header("Settings")
     
-    # Username input
-    username = st.text_input("Username", value=st.session_state.username)
-    if username != st.session_state.username:
-        st.session_state.username = username
+    # Username input; bound to session state by key so send callbacks see edits
+    # committed together with the click
+    st.text_input("Username", key="username")
     
     # Server URL
     server_url = st.text_input(
@@ -41,24 +153,36 @@ with st.sidebar:
         help="Enter your chat server WebSocket URL"
     )
     
-    # Connection status
-    st.markdown("### Connection Info")
-
-# Main chat interface
-chat_container = st.container()
-input_container = st.container()
-
-# Create WebSocket connection
-conn = swc.connect(
-    url=server_url,
-    key="chat_connection",
-    auto_reconnect=True,
-    reconnect_interval=2000,
-    max_reconnect_attempts=10
-)
+    # Binary framing is opt-in: clients that don't speak MessagePack would
+    # show its frames as garbage
+    use_msgpack = st.checkbox(
+        "Send as MessagePack (binary frames)",
+        value=False,
+        disabled=msgpack is None,
+        help="Every client in the room must use the same setting"
+        if msgpack is not None else "Install msgpack to enable binary framing"
+    )
+    
+    # Clear chat button
+    if st.button("Clear Chat"):
+        st.session_state.messages.clear()
+        st.session_state.msg_ids.clear()
+        st.rerun()
 
-# Update sidebar with connection status
-with st.sidebar:
+
+@st.fragment
+def chat_ui(server_url, use_msgpack):
+    """Chat interface; as a fragment, receiving or sending a message reruns only this block."""
+    # Create WebSocket connection
+    conn = swc.connect(
+        url=server_url,
+        key="chat_connection",
+        auto_reconnect=True,
+        reconnect_interval=2000,
+        max_reconnect_attempts=10
+    )
+    
+    # Connection status
     if conn.state == "OPEN":
         st.success(f"🟢 Connected")
     elif conn.state == "CONNECTING":
@@ -68,177 +192,150 @@ with st.sidebar:
     elif conn.state == "ERROR":
         st.error(f"🔴 Error: {conn.error}")
     
-    st.text(f"Ready State: {conn.ready_state}")
+    st.caption(f"Ready State: {conn.ready_state}")
     
-    # Clear chat button
-    if st.button("Clear Chat"):
-        st.session_state.messages = []
-        st.rerun()
-
-# Handle received messages
-if conn.last_message:
-    try:
-        # Try to parse as JSON (for structured chat messages)
-        if isinstance(conn.last_message, str):
-            try:
-                msg_data = json.loads(conn.last_message)
-            except:
-                # If not JSON, treat as plain text
-                msg_data = {
-                    "type": "message",
-                    "user": "System",
-                    "content": conn.last_message,
-                    "timestamp": datetime.now().isoformat()
-                }
-        else:
-            msg_data = conn.last_message
-        
-        # Add to message history if it's a new message
-        if msg_data not in st.session_state.messages:
-            st.session_state.messages.append(msg_data)
-    except Exception as e:
-        st.error(f"Error processing message: {e}")
-
-# Display chat messages
-with chat_container:
-    st.markdown("### Chat Messages")
+    chat_container = st.container()
+    input_container = st.container()
     
-    # Create a scrollable area for messages
-    message_area = st.container()
+    # Handle each received message once: reruns return the same last_message,
+    # so the per-arrival counter decides whether it is new. The message id set
+    # still drops echoes of messages this client already added when sending.
+    if conn.last_message and conn.message_count != st.session_state.get("last_message_count"):
+        st.session_state.last_message_count = conn.message_count
+        try:
+            raw = conn.last_message
+            if isinstance(raw, bytes) and use_msgpack:
+                # Binary frames carry MessagePack-encoded chat messages
+                msg_data = msgpack.unpackb(raw, raw=False)
+            elif isinstance(raw, bytes):
+                # The browser only parses text frames, so binary frames may
+                # still hold JSON
+                try:
+                    msg_data = json_loads(raw)
+                except ValueError:
+                    msg_data = system_message(raw.decode(errors="replace"))
+            elif isinstance(raw, str):
+                # Text frames holding valid JSON already arrive as dicts, so
+                # any string is plain text
+                msg_data = system_message(raw)
+            else:
+                msg_data = raw
+            
+            # Add to message history unless it echoes one we already have
+            add_message(msg_data)
+        except Exception as e:
+            st.error(f"Error processing message: {e}")
     
-    with message_area:
+    # Display chat messages
+    with chat_container:
+        st.markdown("### Chat Messages")
+        
+        # Build all bubbles into one HTML block so the history renders as a single element
+        html_parts = [CHAT_CSS]
         for msg in st.session_state.messages:
             if isinstance(msg, dict):
                 user = msg.get("user", "Unknown")
-                content = msg.get("content", "")
-                timestamp = msg.get("timestamp", "")
+                # Escape everything interpolated: one stray tag would otherwise
+                # break the shared CSS and every bubble after it
+                user_html = html.escape(str(user))
+                content_html = html.escape(str(msg.get("content", "")))
+                timestamp_html = html.escape(format_time(msg))
                 msg_type = msg.get("type", "message")
                 
                 # Different styling for different message types
                 if msg_type == "system":
-                    st.info(f"🔔 {content}")
-                elif user == st.session_state.username:
-                    # Current user's messages (right-aligned)
-                    col1, col2 = st.columns([1, 3])
-                    with col2:
-                        st.markdown(
-                            f"""
-                            <div style="text-align: right; background-color: #007bff; color: white; 
-                                        padding: 10px; border-radius: 10px; margin: 5px 0;">
-                                <strong>{user}</strong><br>
-                                {content}<br>
-                                <small style="opacity: 0.7;">{timestamp[:19]}</small>
-                            </div>
-                            """,
-                            unsafe_allow_html=True
-                        )
+                    html_parts.append(
+                        f'<div class="chat-row system"><div class="chat-bubble">🔔 {content_html}</div></div>'
+                    )
                 else:
-                    # Other users' messages (left-aligned)
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        st.markdown(
-                            f"""
-                            <div style="background-color: #f1f1f1; color: black; 
-                                        padding: 10px; border-radius: 10px; margin: 5px 0;">
-                                <strong>{user}</strong><br>
-                                {content}<br>
-                                <small style="opacity: 0.7;">{timestamp[:19]}</small>
-                            </div>
-                            """,
-                            unsafe_allow_html=True
-                        )
+                    # Current user's messages are right-aligned, others left-aligned
+                    row_class = "me" if user == st.session_state.username else "other"
+                    html_parts.append(
+                        f'<div class="chat-row {row_class}"><div class="chat-bubble">'
+                        f'<strong>{user_html}</strong><br>{content_html}<br>'
+                        f'<small>{timestamp_html}</small></div></div>'
+                    )
             else:
                 # Fallback for non-dict messages
-                st.text(str(msg))
-
-# Input area
-with input_container:
+                html_parts.append(
+                    f'<div class="chat-row other"><div class="chat-bubble">{html.escape(str(msg))}</div></div>'
+                )
+        
+        st.markdown("".join(html_parts), unsafe_allow_html=True)
+    
+    # Input area; sending happens in button callbacks, which run before the
+    # next rerun (of this fragment or the whole script, whichever Streamlit
+    # picks) so that rerun's connect() call hands the message to the component
+    with input_container:
+        st.markdown("---")
+        col1, col2 = st.columns([5, 1])
+        
+        with col1:
+            st.text_input(
+                "Type a message...",
+                key="message_input",
+                placeholder="Enter your message and press Enter",
+                label_visibility="collapsed",
+                on_change=send_chat,
+                args=(conn, None, use_msgpack)
+            )
+        
+        with col2:
+            st.button("Send", type="primary", use_container_width=True,
+                      on_click=send_chat, args=(conn, None, use_msgpack))
+        
+        # Additional message options
+        col3, col4, col5 = st.columns(3)
+        
+        with col3:
+            st.button("👋 Send Hello", on_click=send_chat,
+                      args=(conn, "Hello everyone! 👋", use_msgpack))
+        
+        with col4:
+            st.button("😊 Send Emoji", on_click=send_chat,
+                      args=(conn, "😊 👍 ❤️", use_msgpack))
+        
+        with col5:
+            st.button("📍 Send Location", on_click=send_chat,
+                      args=(conn, "📍 I'm here!", use_msgpack))
+        
+        if st.session_state.pop("send_failed", False):
+            st.error("⚠️ Not connected to server. Please wait for connection...")
+    
+    # Display typing indicator
+    if conn.is_open():
+        st.markdown(
+            """
+            <style>
+            @keyframes pulse {
+                0% { opacity: 0.6; }
+                50% { opacity: 1; }
+                100% { opacity: 0.6; }
+            }
+            .typing-indicator {
+                animation: pulse 1.5s infinite;
+                color: #666;
+                font-style: italic;
+            }
+            </style>
+            """,
+            unsafe_allow_html=True
+        )
+    
+    # Footer with statistics
     st.markdown("---")
-    col1, col2 = st.columns([5, 1])
+    col1, col2, col3 = st.columns(3)
     
     with col1:
-        message_input = st.text_input(
-            "Type a message...",
-            key="message_input",
-            placeholder="Enter your message and press Enter",
-            label_visibility="collapsed"
-        )
+        st.metric("Total Messages", len(st.session_state.messages))
     
     with col2:
-        send_button = st.button("Send", type="primary", use_container_width=True)
-    
-    # Additional message options
-    col3, col4, col5 = st.columns(3)
+        st.metric("Connection Status", conn.state)
     
     with col3:
-        if st.button("👋 Send Hello"):
-            message_input = "Hello everyone! 👋"
-            send_button = True
-    
-    with col4:
-        if st.button("😊 Send Emoji"):
-            message_input = "😊 👍 ❤️"
-            send_button = True
-    
-    with col5:
-        if st.button("📍 Send Location"):
-            message_input = "📍 I'm here!"
-            send_button = True
-
-# Send message
-if (message_input and send_button) or (message_input and st.session_state.get("enter_pressed")):
-    if conn.is_open():
-        # Create structured message
-        chat_message = {
-            "type": "message",
-            "user": st.session_state.username,
-            "content": message_input,
-            "timestamp": datetime.now().isoformat(),
-            "user_id": st.session_state.user_id
-        }
-        
-        # Send message
-        conn.send(chat_message)
-        
-        # Add to local message history (for echo servers)
-        st.session_state.messages.append(chat_message)
-        
-        # Clear input
-        st.rerun()
-    else:
-        st.error("⚠️ Not connected to server. Please wait for connection...")
-
-# Display typing indicator
-if conn.is_open():
-    st.markdown(
-        """
-        <style>
-        @keyframes pulse {
-            0% { opacity: 0.6; }
-            50% { opacity: 1; }
-            100% { opacity: 0.6; }
-        }
-        .typing-indicator {
-            animation: pulse 1.5s infinite;
-            color: #666;
-            font-style: italic;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
-
-# Footer with statistics
-st.markdown("---")
-col1, col2, col3 = st.columns(3)
-
-with col1:
-    st.metric("Total Messages", len(st.session_state.messages))
+        if st.session_state.messages:
+            last_msg = st.session_state.messages[-1]
+            st.metric("Last Message", (format_time(last_msg) or "N/A") if isinstance(last_msg, dict) else "N/A")
 
-with col2:
-    st.metric("Connection Status", conn.state)
 
-with col3:
-    if st.session_state.messages:
-        last_msg_time = st.session_state.messages[-1].get("timestamp", "N/A")
-        st.metric("Last Message", last_msg_time[:19] if isinstance(last_msg_time, str) else "N/A")
\ No newline at end of file
+chat_ui(server_url, use_msgpack)
@@ -11,20 +11,196 @@ import plotly.graph_objects as go
 from datetime import datetime
 import numpy as np
 
+# Columns of the trade ring buffer
+BUFFER_FIELDS = ('time', 'price', 'volume', 'side')
+
+# Trade times are stored as naive local datetime64[ms], matching what
+# datetime.fromtimestamp() produced, by shifting the UTC epoch milliseconds
+LOCAL_UTC_OFFSET_MS = int(datetime.now().astimezone().utcoffset().total_seconds() * 1000)
+
+# Side codes stored in the ring buffer
+SELL, BUY = 0, 1
+
+# Simulated order book depth (price levels per side) and its random generator
+BOOK_LEVELS = np.arange(1, 6)
+rng = np.random.default_rng()
+
+# Recent-trades table: number of rows and side labels indexed by side code
+RECENT_TRADES = 20
+SIDE_LABELS = np.array(["🔴 SELL", "🟢 BUY"])
+
+
+def make_buffer(size):
+    """Preallocated struct-of-arrays ring buffer holding the last `size` trades."""
+    return {
+        'time': np.empty(size, dtype='datetime64[ms]'),
+        'price': np.empty(size, dtype='f8'),
+        'volume': np.empty(size, dtype='f8'),
+        'side': np.empty(size, dtype='u1'),
+        'head': 0,  # Total trades written; the next slot is head % size
+        'count': 0,  # Number of valid slots
+    }
+
+
+def ordered(buf, field):
+    """Chronological view of a buffer column (copied only once the buffer has wrapped)."""
+    arr = buf[field]
+    start = buf['head'] % len(arr)
+    if buf['count'] < len(arr) or start == 0:
+        return arr[:buf['count']]
+    return np.concatenate((arr[start:], arr[:start]))
+
+
+def tail(buf, field, n):
+    """The last `n` trades of a buffer column in chronological order (copied only if they wrap)."""
+    arr = buf[field]
+    n = min(n, buf['count'])
+    end = buf['head'] % len(arr)
+    if n <= end:
+        return arr[end - n:end]
+    return np.concatenate((arr[end - n:], arr[:end]))
+
+
+def resize_buffer(buf, size):
+    """Copy the most recent trades into a new buffer of a different size."""
+    new_buf = make_buffer(size)
+    n = min(buf['count'], size)
+    if n:
+        for field in BUFFER_FIELDS:
+            new_buf[field][:n] = ordered(buf, field)[-n:]
+    new_buf['head'] = new_buf['count'] = n
+    return new_buf
+
+
+def message_key(msg):
+    """Cheap identity of a received message, used to skip re-processing it on reruns."""
+    if isinstance(msg, dict):
+        # Binance trade events carry a unique trade id and trade time
+        return (msg.get('t'), msg.get('T'))
+    return hash(msg) if isinstance(msg, (str, bytes)) else id(msg)
+
+
+def history_views(buf):
+    """Chronological buffer columns, memoized on the buffer head.
+    
+    Kept in session_state rather than st.cache_data, whose cache is shared by all
+    sessions and would mix up different users' buffers with the same head.
+    """
+    cache_key = (buf['head'], len(buf['price']))
+    cached = st.session_state.get('_history_views')
+    if cached is None or cached[0] != cache_key:
+        views = {field: ordered(buf, field) for field in BUFFER_FIELDS}
+        cached = (cache_key, views)
+        st.session_state._history_views = cached
+    return cached[1]
+
+
+def price_figure(title):
+    """Price chart with line and buy/sell marker traces, built once per trading pair."""
+    fig = st.session_state.get('_price_fig')
+    if fig is None or fig.layout.title.text != title:
+        fig = go.Figure()
+        
+        # Add price line
+        fig.add_trace(go.Scatter(
+            mode='lines',
+            name='Price',
+            line=dict(color='#00D4FF', width=2)
+        ))
+        
+        # Add buy/sell markers
+        fig.add_trace(go.Scatter(
+            mode='markers',
+            name='Buy',
+            marker=dict(color='green', size=8, symbol='triangle-up')
+        ))
+        
+        fig.add_trace(go.Scatter(
+            mode='markers',
+            name='Sell',
+            marker=dict(color='red', size=8, symbol='triangle-down')
+        ))
+        
+        # Add moving average with a ±2σ band (hidden until enabled)
+        band_line = dict(color='rgba(255, 165, 0, 0.3)', width=1)
+        fig.add_trace(go.Scatter(
+            mode='lines',
+            name='Upper Band',
+            line=band_line,
+            showlegend=False,
+            visible=False
+        ))
+        
+        fig.add_trace(go.Scatter(
+            mode='lines',
+            name='Lower Band',
+            line=band_line,
+            fill='tonexty',
+            fillcolor='rgba(255, 165, 0, 0.1)',
+            showlegend=False,
+            visible=False
+        ))
+        
+        fig.add_trace(go.Scatter(
+            mode='lines',
+            name='Moving Average',
+            line=dict(color='orange', width=1, dash='dot'),
+            visible=False
+        ))
+        
+        fig.update_layout(
+            title=title,
+            xaxis_title="Time",
+            yaxis_title="Price (USDT)",
+            hovermode='x unified',
+            template='plotly_dark',
+            height=400
+        )
+        st.session_state._price_fig = fig
+    return fig
+
+
+def rolling_mean_std(x, window):
+    """Trailing rolling mean and standard deviation over the last `window` points.
+    
+    Computed from running sums in a single O(n) pass; the first points use the
+    shorter history available. Values are shifted by x[0] first so the sum of
+    squares doesn't lose precision on large prices.
+    """
+    shifted = x - x[0]
+    s1 = np.cumsum(shifted)
+    s2 = np.cumsum(shifted * shifted)
+    s1[window:] = s1[window:] - s1[:-window]
+    s2[window:] = s2[window:] - s2[:-window]
+    n = np.minimum(np.arange(1, len(x) + 1), window)
+    mean = s1 / n
+    std = np.sqrt(np.maximum(s2 / n - mean * mean, 0.0))
+    return mean + x[0], std
+
+
+def volume_figure():
+    """Volume bar chart, built once and reused across reruns."""
+    fig = st.session_state.get('_volume_fig')
+    if fig is None:
+        fig = go.Figure()
+        fig.add_trace(go.Bar(name='Volume'))
+        fig.update_layout(
+            title="Trade Volume",
+            xaxis_title="Time",
+            yaxis_title="Volume",
+            template='plotly_dark',
+            height=300
+        )
+        st.session_state._volume_fig = fig
+    return fig
+
+
 st.set_page_config(
     page_title="Live Trading Dashboard",
     page_icon="📊",
     layout="wide"
 )
 
-# Initialize session state
-if "price_history" not in st.session_state:
-    st.session_state.price_history = []
-if "volume_history" not in st.session_state:
-    st.session_state.volume_history = []
-if "trades_history" not in st.session_state:
-    st.session_state.trades_history = []
-
 st.title("📊 Live Cryptocurrency Trading Dashboard")
 
 # Sidebar configuration
@@ -41,6 +217,8 @@ with st.sidebar:
     # Chart settings
     st.subheader("Chart Settings")
     max_points = st.slider("Max Data Points", 50, 500, 200)
+    show_indicators = st.checkbox("Show Moving Average Band", value=False)
+    ma_window = st.slider("Moving Average Window", 5, 100, 20, disabled=not show_indicators)
     update_interval = st.slider("Update Interval (ms)", 100, 2000, 500)
     
     # Display settings
@@ -52,80 +230,91 @@ with st.sidebar:
     st.markdown("### Data Source")
     st.info("Connected to Binance WebSocket API")
 
-# Create main layout
-if show_orderbook:
-    col1, col2 = st.columns([3, 1])
-else:
-    col1 = st.container()
-    col2 = None
+# Trade history ring buffer, resized when the Max Data Points setting changes
+if "trade_buffer" not in st.session_state:
+    st.session_state.trade_buffer = make_buffer(max_points)
+elif len(st.session_state.trade_buffer['price']) != max_points:
+    st.session_state.trade_buffer = resize_buffer(st.session_state.trade_buffer, max_points)
+buf = st.session_state.trade_buffer
 
-# Connect to Binance WebSocket
-ws_url = f"wss://stream.binance.com:9443/ws/{trading_pair}@trade"
-conn = swc.connect(
-    url=ws_url,
-    key=f"binance_{trading_pair}",
-    auto_reconnect=True,
-    reconnect_interval=3000
-)
+# Tables that only need a periodic refresh, not one per trade (seconds)
+TABLE_REFRESH_SECONDS = 2
 
-# Connection status
-status_placeholder = st.empty()
-with status_placeholder.container():
-    if conn.state == "OPEN":
-        st.success(f"🟢 Connected to {trading_pair.upper()} stream")
-    elif conn.state == "CONNECTING":
-        st.warning("🟡 Connecting to Binance...")
-    else:
-        st.error(f"🔴 Connection {conn.state}")
 
-# Process incoming trade data
-current_price = 0
-current_volume = 0
-
-if conn.last_message:
-    try:
-        trade_data = json.loads(conn.last_message) if isinstance(conn.last_message, str) else conn.last_message
-        
-        # Extract trade information
-        current_price = float(trade_data.get('p', 0))
-        current_volume = float(trade_data.get('q', 0))
-        trade_time = datetime.fromtimestamp(trade_data.get('T', 0) / 1000)
-        is_buyer_maker = trade_data.get('m', False)
-        
-        # Update history
-        st.session_state.price_history.append({
-            'time': trade_time,
-            'price': current_price,
-            'volume': current_volume,
-            'side': 'sell' if is_buyer_maker else 'buy'
-        })
-        
-        # Keep only recent data points
-        st.session_state.price_history = st.session_state.price_history[-max_points:]
+@st.fragment
+def live_block(buf, trading_pair, show_volume, show_indicators, ma_window):
+    """Connection, metrics and charts; as a fragment, each incoming trade reruns only this block."""
+    max_points = len(buf['price'])
+    
+    # Connect to Binance WebSocket
+    ws_url = f"wss://stream.binance.com:9443/ws/{trading_pair}@trade"
+    conn = swc.connect(
+        url=ws_url,
+        key=f"binance_{trading_pair}",
+        auto_reconnect=True,
+        reconnect_interval=3000
+    )
+    
+    # Connection status
+    status_placeholder = st.empty()
+    with status_placeholder.container():
+        if conn.state == "OPEN":
+            st.success(f"🟢 Connected to {trading_pair.upper()} stream")
+        elif conn.state == "CONNECTING":
+            st.warning("🟡 Connecting to Binance...")
+        else:
+            st.error(f"🔴 Connection {conn.state}")
+    
+    # Process incoming trade data, parsing each trade only the first time it is
+    # seen; reruns triggered by widgets return the same last_message
+    msg_key = message_key(conn.last_message) if conn.last_message else None
+    
+    if conn.last_message and msg_key != st.session_state.get('_last_parsed_key'):
+        st.session_state._last_parsed_key = msg_key
+        try:
+            trade_data = json.loads(conn.last_message) if isinstance(conn.last_message, str) else conn.last_message
+            
+            # Extract trade information
+            current_price = float(trade_data.get('p', 0))
+            current_volume = float(trade_data.get('q', 0))
+            trade_time_ms = int(trade_data.get('T', 0))
+            is_buyer_maker = trade_data.get('m', False)
+            
+            # Write into the next ring-buffer slot, overwriting the oldest trade
+            slot = buf['head'] % max_points
+            buf['time'][slot] = trade_time_ms + LOCAL_UTC_OFFSET_MS
+            buf['price'][slot] = current_price
+            buf['volume'][slot] = current_volume
+            buf['side'][slot] = SELL if is_buyer_maker else BUY
+            buf['head'] += 1
+            buf['count'] = min(buf['count'] + 1, max_points)
         
-    except Exception as e:
-        st.error(f"Error processing trade data: {e}")
-
-# Main content area
-with col1:
+        except Exception as e:
+            st.error(f"Error processing trade data: {e}")
+    
+    # Chronological views of the trade history, shared by the charts below
+    has_history = buf['count'] > 0
+    if has_history:
+        views = history_views(buf)
+        times = views['time']
+        prices = views['price']
+        volumes = views['volume']
+        sides = views['side']
+        buy_mask = sides == BUY  # Every non-buy trade is a sell
+    
     # Price metrics
     metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
     
-    if st.session_state.price_history:
-        df = pd.DataFrame(st.session_state.price_history)
-        current_price = df['price'].iloc[-1]
-        
-        # Calculate metrics
-        if len(df) > 1:
-            price_change = current_price - df['price'].iloc[0]
-            price_change_pct = (price_change / df['price'].iloc[0]) * 100
-            total_volume = df['volume'].sum()
-            avg_price = df['price'].mean()
-        else:
-            price_change = 0
-            price_change_pct = 0
-            total_volume = current_volume
-            avg_price = current_price
+    if has_history:
+        # Calculate metrics straight from the ring buffer: sum and mean don't
+        # depend on order, and first/last are single slot lookups
+        count = buf['count']
+        current_price = buf['price'][(buf['head'] - 1) % max_points]
+        first_price = buf['price'][(buf['head'] - count) % max_points]
+        price_change = current_price - first_price  # 0 for a single trade
+        price_change_pct = (price_change / first_price) * 100
+        total_volume = buf['volume'][:count].sum()
+        avg_price = buf['price'][:count].mean()
         
         with metric_col1:
             st.metric(
@@ -148,8 +337,8 @@ with col1:
             )
         
         with metric_col4:
-            buy_trades = len(df[df['side'] == 'buy'])
-            sell_trades = len(df[df['side'] == 'sell'])
+            buy_trades = int(buy_mask.sum())
+            sell_trades = len(sides) - buy_trades
             st.metric(
                 "Buy/Sell Ratio",
                 f"{buy_trades}/{sell_trades}"
@@ -158,135 +347,117 @@ with col1:
     # Price chart
     st.subheader("Price Chart")
     
-    if st.session_state.price_history:
-        df = pd.DataFrame(st.session_state.price_history)
+    if has_history:
+        # Update the cached figure's traces in place rather than rebuilding it
+        fig = price_figure(f"{trading_pair.upper()} Price")
+        buy_idx = np.flatnonzero(buy_mask)
+        sell_idx = np.flatnonzero(~buy_mask)
         
-        # Create candlestick-like chart
-        fig = go.Figure()
-        
-        # Add price line
-        fig.add_trace(go.Scatter(
-            x=df['time'],
-            y=df['price'],
-            mode='lines',
-            name='Price',
-            line=dict(color='#00D4FF', width=2)
-        ))
-        
-        # Add buy/sell markers
-        buy_df = df[df['side'] == 'buy']
-        sell_df = df[df['side'] == 'sell']
-        
-        fig.add_trace(go.Scatter(
-            x=buy_df['time'],
-            y=buy_df['price'],
-            mode='markers',
-            name='Buy',
-            marker=dict(color='green', size=8, symbol='triangle-up')
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=sell_df['time'],
-            y=sell_df['price'],
-            mode='markers',
-            name='Sell',
-            marker=dict(color='red', size=8, symbol='triangle-down')
-        ))
-        
-        fig.update_layout(
-            title=f"{trading_pair.upper()} Price",
-            xaxis_title="Time",
-            yaxis_title="Price (USDT)",
-            hovermode='x unified',
-            template='plotly_dark',
-            height=400
-        )
+        with fig.batch_update():
+            fig.data[0].x, fig.data[0].y = times, prices
+            fig.data[1].x, fig.data[1].y = times[buy_idx], prices[buy_idx]
+            fig.data[2].x, fig.data[2].y = times[sell_idx], prices[sell_idx]
+            
+            for trace in fig.data[3:]:
+                trace.visible = show_indicators
+            if show_indicators:
+                ma, sd = rolling_mean_std(prices, ma_window)
+                fig.data[3].x, fig.data[3].y = times, ma + 2 * sd
+                fig.data[4].x, fig.data[4].y = times, ma - 2 * sd
+                fig.data[5].x, fig.data[5].y = times, ma
         
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("Waiting for trade data...")
     
     # Volume chart
-    if show_volume and st.session_state.price_history:
+    if show_volume and has_history:
         st.subheader("Volume Analysis")
         
-        df = pd.DataFrame(st.session_state.price_history)
+        fig_volume = volume_figure()
         
-        # Create volume bars
-        fig_volume = go.Figure()
+        with fig_volume.batch_update():
+            fig_volume.data[0].x, fig_volume.data[0].y = times, volumes
+            fig_volume.data[0].marker.color = np.where(buy_mask, 'green', 'red')
         
-        colors = ['green' if side == 'buy' else 'red' for side in df['side']]
+        st.plotly_chart(fig_volume, use_container_width=True)
+
+
+@st.fragment(run_every=TABLE_REFRESH_SECONDS)
+def order_book(buf):
+    """Simulated order book around the latest price, refreshed on a timer."""
+    st.subheader("Order Book")
+    st.caption("(Simulated)")
+    
+    # Generate fake order book data (5 levels per side, one random draw)
+    current_price = buf['price'][(buf['head'] - 1) % len(buf['price'])] if buf['count'] else 0
+    if current_price > 0:
+        spread = current_price * 0.001
+        offsets = spread * BOOK_LEVELS
+        bid_prices = current_price - offsets
+        ask_prices = current_price + offsets
+        amounts = rng.uniform(0.1, 2.0, 2 * len(BOOK_LEVELS))
         
-        fig_volume.add_trace(go.Bar(
-            x=df['time'],
-            y=df['volume'],
-            name='Volume',
-            marker_color=colors
-        ))
+        # Bids
+        st.markdown("**Bids** 🟢")
+        st.dataframe(pd.DataFrame({
+            'Price': ["${:,.2f}".format(p) for p in bid_prices],
+            'Amount': ["{:,.4f}".format(a) for a in amounts[:len(BOOK_LEVELS)]]
+        }), hide_index=True)
         
-        fig_volume.update_layout(
-            title="Trade Volume",
-            xaxis_title="Time",
-            yaxis_title="Volume",
-            template='plotly_dark',
-            height=300
-        )
+        # Current price
+        st.metric("Mid Price", f"${current_price:,.2f}")
         
-        st.plotly_chart(fig_volume, use_container_width=True)
+        # Asks
+        st.markdown("**Asks** 🔴")
+        st.dataframe(pd.DataFrame({
+            'Price': ["${:,.2f}".format(p) for p in ask_prices],
+            'Amount': ["{:,.4f}".format(a) for a in amounts[len(BOOK_LEVELS):]]
+        }), hide_index=True)
 
-# Order book simulation (right column)
-if col2 and show_orderbook:
-    with col2:
-        st.subheader("Order Book")
-        st.caption("(Simulated)")
-        
-        # Generate fake order book data
-        if current_price > 0:
-            spread = current_price * 0.001
-            
-            # Bids
-            st.markdown("**Bids** 🟢")
-            bids = []
-            for i in range(5):
-                price = current_price - (spread * (i + 1))
-                amount = np.random.uniform(0.1, 2.0)
-                bids.append({
-                    'Price': f"${price:,.2f}",
-                    'Amount': f"{amount:,.4f}"
-                })
-            st.dataframe(pd.DataFrame(bids), hide_index=True)
-            
-            # Current price
-            st.metric("Mid Price", f"${current_price:,.2f}")
-            
-            # Asks
-            st.markdown("**Asks** 🔴")
-            asks = []
-            for i in range(5):
-                price = current_price + (spread * (i + 1))
-                amount = np.random.uniform(0.1, 2.0)
-                asks.append({
-                    'Price': f"${price:,.2f}",
-                    'Amount': f"{amount:,.4f}"
-                })
-            st.dataframe(pd.DataFrame(asks), hide_index=True)
 
-# Recent trades table
-if show_trades and st.session_state.price_history:
+@st.fragment(run_every=TABLE_REFRESH_SECONDS)
+def recent_trades(buf):
+    """Last RECENT_TRADES trades, read off the ring buffer and refreshed on a timer."""
+    if not buf['count']:
+        return
+    
     st.subheader("Recent Trades")
     
-    df = pd.DataFrame(st.session_state.price_history[-20:])  # Last 20 trades
-    df['time'] = df['time'].dt.strftime('%H:%M:%S')
-    df['price'] = df['price'].apply(lambda x: f"${x:,.2f}")
-    df['volume'] = df['volume'].apply(lambda x: f"{x:,.4f}")
-    df['side'] = df['side'].apply(lambda x: "🟢 BUY" if x == 'buy' else "🔴 SELL")
+    df = pd.DataFrame({
+        'time': pd.DatetimeIndex(tail(buf, 'time', RECENT_TRADES)).strftime('%H:%M:%S'),
+        'price': ["${:,.2f}".format(p) for p in tail(buf, 'price', RECENT_TRADES)],
+        'volume': ["{:,.4f}".format(v) for v in tail(buf, 'volume', RECENT_TRADES)],
+        'side': SIDE_LABELS[tail(buf, 'side', RECENT_TRADES)]
+    })
     
     st.dataframe(
-        df[['time', 'price', 'volume', 'side']],
+        df,
         hide_index=True,
         use_container_width=True
     )
 
+
+# Create main layout
+if show_orderbook:
+    col1, col2 = st.columns([3, 1])
+else:
+    col1 = st.container()
+    col2 = None
+
+# Main content area
+with col1:
+    live_block(buf, trading_pair, show_volume, show_indicators, ma_window)
+
+# Order book simulation (right column)
+if col2 and show_orderbook:
+    with col2:
+        order_book(buf)
+
+# Recent trades table
+if show_trades:
+    recent_trades(buf)
+
 # Footer
 st.markdown("---")
 st.caption("Data provided by Binance WebSocket API. This is a demonstration of real-time data streaming capabilities.")
\ No newline at end of file
@@ -5,7 +5,14 @@ import {
   withStreamlitConnection,
   ComponentProps,
 } from "streamlit-component-lib";
-import { WebSocketManager, WebSocketState } from "./websocket-manager";
+import {
+  WebSocketManager,
+  WebSocketState,
+  base64ToBytes,
+} from "./websocket-manager";
+
+// Binary messages arrive from Python as {binary: <base64>}
+type OutgoingMessage = string | { binary: string };
 
 interface StreamlitWebSocketProps extends ComponentProps {
   args: {
@@ -15,13 +22,14 @@ interface StreamlitWebSocketProps extends ComponentProps {
     auto_reconnect?: boolean;
     reconnect_interval?: number;
     max_reconnect_attempts?: number;
-    send_message?: string;
+    send_message?: OutgoingMessage[];
+    send_seq?: number;
   };
 }
 
 const StreamlitWebSocket: React.FC<StreamlitWebSocketProps> = ({ args }) => {
   const wsManagerRef = useRef<WebSocketManager | null>(null);
-  const lastSentMessageRef = useRef<string | null>(null);
+  const lastSentSeqRef = useRef(0);
   const [isInitialized, setIsInitialized] = useState(false);
 
   // Initialize WebSocket manager
@@ -33,17 +41,22 @@ const StreamlitWebSocket: React.FC<StreamlitWebSocketProps> = ({ args }) => {
       autoReconnect: args.auto_reconnect !== false,
       reconnectInterval: args.reconnect_interval || 3000,
       maxReconnectAttempts: args.max_reconnect_attempts || 5,
-      onMessage: (data) => {
+      onMessage: (data, binary) => {
         // Update Streamlit with new message
         const state = manager.getState();
         Streamlit.setComponentValue({
           ...state,
           last_message: data,
+          binary,
+          sent_seq: lastSentSeqRef.current,
         });
       },
       onStateChange: (state: WebSocketState) => {
         // Update Streamlit with state change
-        Streamlit.setComponentValue(state);
+        Streamlit.setComponentValue({
+          ...state,
+          sent_seq: lastSentSeqRef.current,
+        });
       },
       onError: (error) => {
         console.error("WebSocket error in component:", error);
@@ -61,21 +74,28 @@ const StreamlitWebSocket: React.FC<StreamlitWebSocketProps> = ({ args }) => {
     };
   }, [args.url]); // Recreate if URL changes
 
-  // Handle sending messages
+  // Handle sending messages: Python drains its queue into send_message and
+  // numbers each batch, so every batch is sent exactly once. Python keeps
+  // passing the last batch until a component value reports it in sent_seq.
+  const sendSeq = args.send_seq || 0;
+
   useEffect(() => {
     if (
       isInitialized &&
+      sendSeq > lastSentSeqRef.current &&
       args.send_message &&
-      args.send_message !== lastSentMessageRef.current &&
       wsManagerRef.current
     ) {
-      console.log("Sending message via manager:", args.send_message);
-      const sent = wsManagerRef.current.send(args.send_message);
-      if (sent) {
-        lastSentMessageRef.current = args.send_message;
+      lastSentSeqRef.current = sendSeq;
+      for (const message of args.send_message) {
+        console.log("Sending message via manager:", message);
+        const payload =
+          typeof message === "object" ? base64ToBytes(message.binary) : message;
+        // Messages sent before the socket opens are queued by the manager
+        wsManagerRef.current.send(payload);
       }
     }
-  }, [args.send_message, isInitialized]);
+  }, [sendSeq, isInitialized]);
 
   // Notify Streamlit that we're ready
   useEffect(() => {
@@ -3,13 +3,16 @@
  * reconnection logic, and message queuing
  */
 
+const MAX_RECONNECT_DELAY = 30000; // Max 30 seconds
+const JITTER_FACTOR = 0.3;
+
 export interface WebSocketConfig {
   url: string;
   protocols?: string[];
   autoReconnect?: boolean;
   reconnectInterval?: number;
   maxReconnectAttempts?: number;
-  onMessage?: (data: any) => void;
+  onMessage?: (data: any, binary: boolean) => void;
   onStateChange?: (state: WebSocketState) => void;
   onError?: (error: string) => void;
 }
@@ -19,6 +22,27 @@ export interface WebSocketState {
   last_message: any;
   error: string | null;
   ready_state: number;
+  binary: boolean; // last_message is a base64-encoded binary frame
+  extensions: string; // Extensions negotiated by the server, e.g. "permessage-deflate"
+  message_count: number; // Messages received so far; increases on every arrival
+}
+
+export function bytesToBase64(data: ArrayBuffer): string {
+  const bytes = new Uint8Array(data);
+  let binaryString = "";
+  for (let i = 0; i < bytes.length; i++) {
+    binaryString += String.fromCharCode(bytes[i]);
+  }
+  return btoa(binaryString);
+}
+
+export function base64ToBytes(encoded: string): Uint8Array {
+  const binaryString = atob(encoded);
+  const bytes = new Uint8Array(binaryString.length);
+  for (let i = 0; i < binaryString.length; i++) {
+    bytes[i] = binaryString.charCodeAt(i);
+  }
+  return bytes;
 }
 
 export class WebSocketManager {
@@ -27,6 +51,7 @@ export class WebSocketManager {
   private reconnectAttempts = 0;
   private reconnectTimeout: NodeJS.Timeout | null = null;
   private messageQueue: any[] = [];
+  private messageCount = 0;
   private isDestroyed = false;
 
   constructor(config: WebSocketConfig) {
@@ -51,6 +76,7 @@ export class WebSocketManager {
 
       // Create new WebSocket
       this.ws = new WebSocket(this.config.url, this.config.protocols);
+      this.ws.binaryType = "arraybuffer";
       this.setupEventHandlers();
       
       // Update state
@@ -73,17 +99,24 @@ export class WebSocketManager {
     this.ws.onmessage = (event) => {
       console.log("WebSocket message received:", event.data);
       let messageData: any;
+      const binary = event.data instanceof ArrayBuffer;
 
-      try {
-        // Try to parse as JSON
-        messageData = JSON.parse(event.data);
-      } catch {
-        // If not JSON, use raw string
-        messageData = event.data;
+      if (binary) {
+        // Binary frames are passed to Python base64-encoded
+        messageData = bytesToBase64(event.data);
+      } else {
+        try {
+          // Try to parse as JSON
+          messageData = JSON.parse(event.data);
+        } catch {
+          // If not JSON, use raw string
+          messageData = event.data;
+        }
       }
 
-      this.config.onMessage(messageData);
-      this.updateState("OPEN", messageData);
+      this.messageCount++;
+      this.config.onMessage(messageData, binary);
+      this.updateState("OPEN", messageData, null, binary);
     };
 
     this.ws.onerror = (error) => {
@@ -135,14 +168,15 @@ export class WebSocketManager {
   }
 
   private getReconnectDelay(): number {
-    // Exponential backoff with jitter
+    // Exponential backoff with jitter: double the base delay on every attempt,
+    // then shave off up to JITTER_FACTOR so clients dropped by the same server
+    // blip don't all reconnect in lockstep
     const baseDelay = this.config.reconnectInterval;
     const exponentialDelay = Math.min(
-      baseDelay * Math.pow(1.5, this.reconnectAttempts - 1),
-      30000 // Max 30 seconds
+      baseDelay * Math.pow(2, this.reconnectAttempts - 1),
+      MAX_RECONNECT_DELAY
     );
-    const jitter = Math.random() * 1000; // 0-1 second jitter
-    return exponentialDelay + jitter;
+    return exponentialDelay * (1 - Math.random() * JITTER_FACTOR);
   }
 
   send(message: any): boolean {
@@ -178,13 +212,17 @@ export class WebSocketManager {
   private updateState(
     state: WebSocketState["state"],
     lastMessage?: any,
-    error?: string | null
+    error?: string | null,
+    binary = false
   ): void {
     const newState: WebSocketState = {
       state,
       last_message: lastMessage ?? null,
       error: error ?? null,
       ready_state: this.ws?.readyState ?? 3,
+      binary,
+      extensions: this.ws?.extensions ?? "",
+      message_count: this.messageCount,
     };
     
     this.config.onStateChange(newState);
@@ -233,6 +271,9 @@ export class WebSocketManager {
       last_message: null,
       error: null,
       ready_state: this.ws?.readyState ?? 3,
+      binary: false,
+      extensions: this.ws?.extensions ?? "",
+      message_count: this.messageCount,
     };
   }
 }
\ No newline at end of file
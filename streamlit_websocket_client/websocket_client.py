@@ -5,9 +5,12 @@ A bidirectional component for real-time WebSocket communication in Streamlit app
 
 import streamlit as st
 import streamlit.components.v1 as components
-from typing import Optional, Dict, Any, Union, List
+from typing import Optional, Dict, Any, Union, List, ClassVar
 import json
-from dataclasses import dataclass, asdict
+import base64
+import re
+from functools import lru_cache
+from dataclasses import dataclass
 import os
 from pathlib import Path
 import logging
@@ -18,20 +21,32 @@ logger = logging.getLogger(__name__)
 # Development vs Production mode
 _DEVELOP_MODE = os.getenv("STREAMLIT_WEBSOCKET_DEVELOP", "").lower() == "true"
 
-if _DEVELOP_MODE:
-    # Development: Point to localhost where npm dev server runs
-    _websocket_component = components.declare_component(
-        "streamlit_websocket_client",
-        url="http://localhost:3001",
-    )
-else:
-    # Production: Use built frontend files
-    parent_dir = Path(__file__).parent
-    build_dir = parent_dir / "frontend" / "build"
-    _websocket_component = components.declare_component(
-        "streamlit_websocket_client",
-        path=str(build_dir)
-    )
+# A ws:// or wss:// URL with no whitespace
+_WS_URL_RE = re.compile(r'wss?://\S+')
+
+# Declared lazily on first connect() so importing the package stays cheap
+_websocket_component = None
+
+
+def _get_component():
+    """Declare the frontend component on first use and reuse it afterwards."""
+    global _websocket_component
+    if _websocket_component is None:
+        if _DEVELOP_MODE:
+            # Development: Point to localhost where npm dev server runs
+            _websocket_component = components.declare_component(
+                "streamlit_websocket_client",
+                url="http://localhost:3001",
+            )
+        else:
+            # Production: Use built frontend files
+            parent_dir = Path(__file__).parent
+            build_dir = parent_dir / "frontend" / "build"
+            _websocket_component = components.declare_component(
+                "streamlit_websocket_client",
+                path=str(build_dir)
+            )
+    return _websocket_component
 
 
 @dataclass
@@ -42,16 +57,42 @@ class WebSocketConnection:
     last_message: Optional[Any] = None
     error: Optional[str] = None
     ready_state: int = 0  # 0=CONNECTING, 1=OPEN, 2=CLOSING, 3=CLOSED
+    extensions: str = ""  # Negotiated extensions, e.g. "permessage-deflate"
+    message_count: int = 0  # Messages received; increases on every arrival
     _key: str = ""
-    _send_queue: Optional[Any] = None
     
-    def send(self, message: Union[str, dict, list]) -> None:
-        """Send a message through the WebSocket connection."""
-        if isinstance(message, (dict, list)):
+    # Outgoing messages held per connection before the oldest are dropped
+    MAX_QUEUED_MESSAGES: ClassVar[int] = 1000
+    
+    def send(self, message: Union[str, bytes, dict, list]) -> None:
+        """Queue a message to be sent through the WebSocket connection.
+        
+        Strings, dicts and lists are sent as text frames (dicts and lists as JSON);
+        bytes are sent as a binary frame.
+        
+        Messages are queued in session state and handed to the browser the next
+        time connect() runs for this connection's key, i.e. on the next rerun.
+        Call st.rerun() (or st.rerun(scope="fragment") inside a fragment) after
+        sending unless something else will trigger one. Messages sent while the
+        connection is not open are dropped, and at most MAX_QUEUED_MESSAGES are
+        kept if connect() stops running for this key.
+        """
+        if not self._key or not self.is_open():
+            logger.warning(f"WebSocket {self._key!r} is not open; dropping outgoing message")
+            return
+        
+        if isinstance(message, (bytes, bytearray)):
+            # Binary payloads travel to the frontend base64-encoded
+            message = {"binary": base64.b64encode(message).decode("ascii")}
+        elif isinstance(message, (dict, list)):
             message = json.dumps(message)
         
-        # This will be picked up by the frontend component
-        self._send_queue = message
+        queue = st.session_state.setdefault(_send_key(self._key), [])
+        queue.append(message)
+        if len(queue) > self.MAX_QUEUED_MESSAGES:
+            # connect() hasn't drained this key in a while; keep the newest
+            logger.warning(f"WebSocket {self._key!r} send queue is full; dropping oldest message")
+            del queue[0]
     
     def is_open(self) -> bool:
         """Check if the connection is open and ready."""
@@ -59,7 +100,27 @@ class WebSocketConnection:
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert connection state to dictionary."""
-        return asdict(self)
+        # Built by hand: dataclasses.asdict() deep-copies every field recursively
+        return {
+            "state": self.state,
+            "last_message": self.last_message,
+            "error": self.error,
+            "ready_state": self.ready_state,
+            "extensions": self.extensions,
+            "message_count": self.message_count,
+            "_key": self._key,
+        }
+
+
+@lru_cache(maxsize=128)
+def _is_valid_url(url: str) -> bool:
+    """Check a WebSocket URL, caching the result for URLs seen on earlier reruns."""
+    return _WS_URL_RE.fullmatch(url) is not None
+
+
+def _send_key(key: str) -> str:
+    """Session state key holding a connection's outgoing message queue."""
+    return f"_websocket_{key}_send"
 
 
 def connect(
@@ -82,7 +143,8 @@ def connect(
         headers: Optional HTTP headers for authentication
         protocols: Optional list of WebSocket subprotocols
         auto_reconnect: Whether to automatically reconnect on disconnect
-        reconnect_interval: Time in ms between reconnection attempts
+        reconnect_interval: Base delay in ms before the first reconnection attempt;
+            doubled on each further attempt (capped at 30s) with up to 30% jitter
         max_reconnect_attempts: Maximum number of reconnection attempts
         default: Default value to return if no connection data exists
         height: Component height (0 for invisible component)
@@ -95,8 +157,8 @@ def connect(
     if not url or not isinstance(url, str):
         raise ValueError("URL must be a non-empty string")
     
-    if not url.startswith(('ws://', 'wss://')):
-        raise ValueError("URL must start with ws:// or wss://")
+    if not _is_valid_url(url):
+        raise ValueError("URL must start with ws:// or wss:// and contain no whitespace")
     
     # Validate key
     if not key or not isinstance(key, str):
@@ -104,18 +166,23 @@ def connect(
     
     # Get the current connection state from session state if it exists
     session_key = f"_websocket_{key}"
-    send_key = f"{session_key}_send"
-    
-    # Check if we need to send a message
-    send_message = None
-    if send_key in st.session_state:
-        send_message = st.session_state[send_key]
-        # Clear the send queue after reading
-        del st.session_state[send_key]
+    send_key = _send_key(key)
+    batch_key = f"{session_key}_send_batch"
+    
+    # Drain any queued outgoing messages; each drained batch gets a new sequence
+    # number so the frontend sends it exactly once, even if it repeats a message.
+    # The last batch is passed again on every render until the frontend reports
+    # it as sent: a rerun can discard the render that first carried it, and the
+    # frontend ignores sequence numbers it has already sent.
+    send_seq, send_message = st.session_state.get(batch_key, (0, []))
+    queued = st.session_state.pop(send_key, None)
+    if queued:
+        send_seq, send_message = send_seq + 1, queued
+        st.session_state[batch_key] = (send_seq, send_message)
     
     try:
         # Call the frontend component
-        component_value = _websocket_component(
+        component_value = _get_component()(
             url=url,
             key=key,
             headers=headers or {},
@@ -124,6 +191,7 @@ def connect(
             reconnect_interval=reconnect_interval,
             max_reconnect_attempts=max_reconnect_attempts,
             send_message=send_message,
+            send_seq=send_seq,
             default=default,
             height=height
         )
@@ -147,28 +215,30 @@ def connect(
             _key=key
         )
     
+    # Binary frames arrive base64-encoded from the frontend
+    last_message = component_value.get("last_message")
+    if component_value.get("binary") and isinstance(last_message, str):
+        last_message = base64.b64decode(last_message)
+    
     # Create connection object from component data
     conn = WebSocketConnection(
         state=component_value.get("state", "CONNECTING"),
-        last_message=component_value.get("last_message"),
+        last_message=last_message,
         error=component_value.get("error"),
         ready_state=component_value.get("ready_state", 0),
+        extensions=component_value.get("extensions", ""),
+        message_count=component_value.get("message_count", 0),
         _key=key
     )
     
+    # Stop resending the last batch once the frontend has sent it
+    if send_message and component_value.get("sent_seq", 0) >= send_seq:
+        st.session_state[batch_key] = (send_seq, [])
+    
     # Store connection in session state for persistence
     st.session_state[session_key] = conn
     
-    # Handle outgoing messages
-    if hasattr(conn, '_send_queue') and conn._send_queue:
-        st.session_state[send_key] = conn._send_queue
-        # Force a rerun to send the message
-        st.rerun()
-    
     return conn
 
 
-# For backward compatibility and convenience
-import streamlit as st
-
 __all__ = ["connect", "WebSocketConnection"]
\ No newline at end of file
@@ -6,6 +6,7 @@ import pytest
 import streamlit as st
 from unittest.mock import Mock, patch, MagicMock
 import json
+import base64
 import sys
 from pathlib import Path
 
@@ -48,23 +49,58 @@ class TestWebSocketConnection:
         conn = WebSocketConnection(state="CONNECTING", ready_state=0)
         assert conn.is_open() is False
     
-    def test_send_message(self):
+    @patch('streamlit.session_state', new_callable=dict)
+    def test_send_message(self, mock_session_state):
         """Test send method"""
-        conn = WebSocketConnection(_key="test")
+        conn = WebSocketConnection(state="OPEN", ready_state=1, _key="test")
         
         # Test string message
         conn.send("Hello")
-        assert conn._send_queue == "Hello"
+        assert mock_session_state["_websocket_test_send"][-1] == "Hello"
         
         # Test dict message
         test_dict = {"type": "test", "data": 123}
         conn.send(test_dict)
-        assert conn._send_queue == json.dumps(test_dict)
+        assert mock_session_state["_websocket_test_send"][-1] == json.dumps(test_dict)
         
         # Test list message
         test_list = [1, 2, 3]
         conn.send(test_list)
-        assert conn._send_queue == json.dumps(test_list)
+        assert mock_session_state["_websocket_test_send"][-1] == json.dumps(test_list)
+        
+        # Messages are queued in session state for the frontend, in order
+        assert mock_session_state["_websocket_test_send"] == [
+            "Hello", json.dumps(test_dict), json.dumps(test_list)
+        ]
+    
+    @patch('streamlit.session_state', new_callable=dict)
+    def test_send_bytes(self, mock_session_state):
+        """Test sending a binary message"""
+        conn = WebSocketConnection(state="OPEN", ready_state=1, _key="test")
+        
+        conn.send(b"\x00\x01binary")
+        assert mock_session_state["_websocket_test_send"][-1] == {
+            "binary": base64.b64encode(b"\x00\x01binary").decode()
+        }
+    
+    @patch('streamlit.session_state', new_callable=dict)
+    def test_send_when_not_open(self, mock_session_state):
+        """Test that messages sent on a connection that isn't open are dropped"""
+        conn = WebSocketConnection(state="CLOSED", ready_state=3, _key="test")
+        
+        conn.send("Hello")
+        assert "_websocket_test_send" not in mock_session_state
+    
+    @patch('streamlit.session_state', new_callable=dict)
+    def test_send_queue_bounded(self, mock_session_state):
+        """Test that an undrained send queue keeps only the newest messages"""
+        conn = WebSocketConnection(state="OPEN", ready_state=1, _key="test")
+        
+        with patch.object(WebSocketConnection, "MAX_QUEUED_MESSAGES", 3):
+            for i in range(5):
+                conn.send(str(i))
+        
+        assert mock_session_state["_websocket_test_send"] == ["2", "3", "4"]
     
     def test_to_dict(self):
         """Test to_dict method"""
@@ -180,6 +216,95 @@ class TestConnect:
         assert conn.error is None
         assert conn.ready_state == 0
     
+    @patch('streamlit_websocket_client.websocket_client._websocket_component')
+    @patch('streamlit.session_state', new_callable=dict)
+    def test_connect_drains_send_queue(self, mock_session_state, mock_component):
+        """Test that queued messages are handed to the frontend once, without a rerun"""
+        mock_component.return_value = {"state": "OPEN", "ready_state": 1}
+        
+        conn = connect(url="wss://test.com", key="test")
+        conn.send("first")
+        conn.send("second")
+        
+        with patch('streamlit.rerun') as mock_rerun:
+            connect(url="wss://test.com", key="test")
+            mock_rerun.assert_not_called()
+        
+        call_args = mock_component.call_args[1]
+        assert call_args['send_message'] == ["first", "second"]
+        assert call_args['send_seq'] == 1
+        assert "_websocket_test_send" not in mock_session_state
+        
+        # The frontend reports the batch as sent: the next render sends nothing
+        mock_component.return_value = {"state": "OPEN", "ready_state": 1, "sent_seq": 1}
+        connect(url="wss://test.com", key="test")
+        connect(url="wss://test.com", key="test")
+        call_args = mock_component.call_args[1]
+        assert call_args['send_message'] == []
+        assert call_args['send_seq'] == 1
+    
+    @patch('streamlit_websocket_client.websocket_client._websocket_component')
+    @patch('streamlit.session_state', new_callable=dict)
+    def test_connect_resends_unacknowledged_batch(self, mock_session_state, mock_component):
+        """Test that a drained batch survives a render that never reaches the frontend"""
+        mock_component.return_value = {"state": "OPEN", "ready_state": 1}
+        
+        conn = connect(url="wss://test.com", key="test")
+        conn.send("hello")
+        
+        # A rerun interrupts this render after the queue was drained
+        mock_component.side_effect = RuntimeError("rerun requested")
+        connect(url="wss://test.com", key="test")
+        
+        # The next render carries the same batch under the same sequence number
+        mock_component.side_effect = None
+        connect(url="wss://test.com", key="test")
+        call_args = mock_component.call_args[1]
+        assert call_args['send_message'] == ["hello"]
+        assert call_args['send_seq'] == 1
+    
+    @patch('streamlit_websocket_client.websocket_client._websocket_component')
+    def test_connect_binary_message(self, mock_component):
+        """Test that binary messages are decoded to bytes"""
+        mock_component.return_value = {
+            "state": "OPEN",
+            "last_message": base64.b64encode(b"\x82\xa1a\x01").decode(),
+            "error": None,
+            "ready_state": 1,
+            "binary": True
+        }
+        
+        conn = connect(url="wss://test.com", key="test")
+        assert conn.last_message == b"\x82\xa1a\x01"
+    
+    @patch('streamlit_websocket_client.websocket_client._websocket_component')
+    def test_connect_extensions(self, mock_component):
+        """Test that negotiated extensions are exposed"""
+        mock_component.return_value = {
+            "state": "OPEN",
+            "last_message": None,
+            "error": None,
+            "ready_state": 1,
+            "extensions": "permessage-deflate"
+        }
+        
+        conn = connect(url="wss://test.com", key="test")
+        assert conn.extensions == "permessage-deflate"
+    
+    @patch('streamlit_websocket_client.websocket_client._websocket_component')
+    def test_connect_message_count(self, mock_component):
+        """Test that the per-arrival message counter is exposed"""
+        mock_component.return_value = {
+            "state": "OPEN",
+            "last_message": "echo",
+            "error": None,
+            "ready_state": 1,
+            "message_count": 2
+        }
+        
+        conn = connect(url="wss://test.com", key="test")
+        assert conn.message_count == 2
+    
     @patch('streamlit_websocket_client.websocket_client._websocket_component')
     def test_connect_error_state(self, mock_component):
         """Test connection in error state"""
@@ -198,6 +323,17 @@ class TestConnect:
         assert conn.state == "ERROR"
         assert conn.error == "Connection refused"
         assert conn.is_open() is False
+    
+    @patch('streamlit.components.v1.declare_component')
+    def test_component_declared_lazily(self, mock_declare):
+        """Test that the component is declared on first use, then reused"""
+        with patch('streamlit_websocket_client.websocket_client._websocket_component', None):
+            mock_declare.return_value.return_value = None
+            
+            connect(url="wss://test.com", key="test")
+            connect(url="wss://test.com", key="test")
+            
+            mock_declare.assert_called_once()
 
 
 class TestEdgeCases:
@@ -205,21 +341,12 @@ class TestEdgeCases:
     
     @patch('streamlit_websocket_client.websocket_client._websocket_component')
     def test_invalid_url(self, mock_component):
-        """Test handling of invalid URLs"""
-        mock_component.return_value = {
-            "state": "ERROR",
-            "error": "Invalid URL",
-            "last_message": None,
-            "ready_state": 3
-        }
-        
-        conn = connect(
-            url="not-a-valid-url",
-            key="test"
-        )
+        """Test that invalid URLs raise before the component is called"""
+        for url in ("not-a-valid-url", "http://test.com", "wss://", "wss://test .com"):
+            with pytest.raises(ValueError):
+                connect(url=url, key="test")
         
-        assert conn.state == "ERROR"
-        assert "Invalid" in conn.error
+        mock_component.assert_not_called()
     
     @patch('streamlit_websocket_client.websocket_client._websocket_component')
     def test_large_message(self, mock_component):
@@ -236,19 +363,20 @@ class TestEdgeCases:
         conn = connect(url="wss://test.com", key="test")
         assert conn.last_message == large_message
     
-    def test_connection_send_unicode(self):
+    @patch('streamlit.session_state', new_callable=dict)
+    def test_connection_send_unicode(self, mock_session_state):
         """Test sending unicode messages"""
-        conn = WebSocketConnection(_key="test")
+        conn = WebSocketConnection(state="OPEN", ready_state=1, _key="test")
         
         # Test unicode string
         unicode_msg = "Hello 世界 🌍"
         conn.send(unicode_msg)
-        assert conn._send_queue == unicode_msg
+        assert mock_session_state["_websocket_test_send"][-1] == unicode_msg
         
         # Test unicode in dict
         unicode_dict = {"message": "Hello 世界", "emoji": "🚀"}
         conn.send(unicode_dict)
-        assert json.loads(conn._send_queue) == unicode_dict
+        assert json.loads(mock_session_state["_websocket_test_send"][-1]) == unicode_dict
     
     @patch('streamlit_websocket_client.websocket_client._websocket_component')
     def test_connection_timeout(self, mock_component):